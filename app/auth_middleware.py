@@ -0,0 +1,203 @@
+"""
+AuthenticateMiddleware shared by the applications.
+
+The middleware accepts credentials from either a session cookie or a
+Bearer JWT in the authorization header.
+"""
+
+import time
+import hashlib
+import logging
+import cachetools
+import starlette.requests
+import starlette.types
+
+_L = logging.getLogger("auth_middleware")
+
+# Verified token claims, keyed by the SHA-256 digest of the JWT. Avoids
+# repeating the RS256 signature check for tokens seen in the last few seconds.
+_claims_cache = cachetools.TTLCache(maxsize=10000, ttl=30)
+
+# JWKS documents fetched ahead of time by prefetch_keys, keyed by URL
+_prefetched_keys = {}
+
+_BEARER = b"Bearer "
+_BEARER_LEN = len(_BEARER)
+
+
+def _find_auth(scope: starlette.types.Scope):
+    """
+    Return the raw authorization header value from scope, or None.
+    """
+    for k, v in scope["headers"]:
+        if k == b"authorization":
+            return v
+    return None
+
+
+async def prefetch_keys(url: str) -> None:
+    """
+    Fetch the JWKS document at url so that the first authenticated request
+    does not block the event loop on the download. Failures are logged, and
+    the keys are then retrieved on first use as before.
+    """
+    import httpx
+
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            _prefetched_keys[url] = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        _L.warning("Unable to prefetch keys from %s: %s", url, e)
+
+
+def _validate_provider(provider_name, provider):
+    """
+    Same checks as starlette_oauth2_api._validate_provider, which cannot be
+    imported here without also importing jose.
+    """
+    mandatory_keys = {"issuer", "keys", "audience"}
+    if not mandatory_keys.issubset(set(provider)):
+        raise ValueError(
+            f'Each provider must contain the following keys: {mandatory_keys}. '
+            f'Provider "{provider_name}" is missing {mandatory_keys - set(provider)}.'
+        )
+    keys = provider["keys"]
+    if isinstance(keys, str) and keys.startswith("http://"):
+        raise ValueError(
+            f'When "keys" is a url, it must start with "https://". '
+            f'This is not true in the provider "{provider_name}"'
+        )
+
+
+def _make_middleware_cls():
+    """
+    Build the AuthenticateMiddleware class. starlette_oauth2_api pulls in
+    jose and the crypto backends, so the import is deferred until the
+    middleware is first needed.
+    """
+    import starlette_oauth2_api
+
+    def _get_keys(url_or_keys):
+        # The prefetched document is only used once, later refreshes (see
+        # key_refresh_minutes) go back to the network.
+        if isinstance(url_or_keys, str):
+            keys = _prefetched_keys.pop(url_or_keys, None)
+            if keys is not None:
+                return keys
+        return starlette_oauth2_api._get_keys(url_or_keys)
+
+    class AuthenticateMiddleware(starlette_oauth2_api.AuthenticateMiddleware):
+        """
+        Override the __call__ method of the AuthenticateMiddleware to also check
+        cookies for auth information. This enables access by either a JWT or the
+        authentication information stored in a cookie.
+
+        In addition to ``public_paths``, which are matched exactly against
+        root_path + path, ``public_prefixes`` is a sequence of path prefixes
+        (e.g. the static files mount) that also bypass authentication.
+        """
+
+        def __init__(
+            self, app: starlette.types.ASGIApp, public_prefixes=(), **options
+        ) -> None:
+            options.setdefault("get_keys", _get_keys)
+            super().__init__(app, **options)
+            self._public_paths_set = frozenset(self._public_paths)
+            self._public_prefixes = tuple(public_prefixes)
+
+        def cached_claims(self, token: str):
+            """
+            Return (provider, claims) for token, using the TTL cache when the
+            token was recently verified and has not yet expired.
+            """
+            key = hashlib.sha256(token.encode()).digest()
+            hit = _claims_cache.get(key)
+            if hit is not None and hit[1].get("exp", 0) > time.time():
+                return hit
+            provider, claims = self.claims(token)
+            if claims.get("exp", 0) > time.time():
+                _claims_cache[key] = (provider, claims)
+            return provider, claims
+
+        async def __call__(
+            self,
+            scope: starlette.types.Scope,
+            receive: starlette.types.Receive,
+            send: starlette.types.Send,
+        ) -> None:
+            # Public paths include the root_path, as request.url.path would
+            path = scope.get("root_path", "") + scope["path"]
+            if path in self._public_paths_set or path.startswith(
+                self._public_prefixes
+            ):
+                return await self._app(scope, receive, send)
+
+            request = starlette.requests.HTTPConnection(scope)
+            user = request.session.get("user")
+
+            # Cookie set with auth info
+            if user is not None:
+                token = user.get("id_token", "")
+            else:
+                # check for authorization header and token on it.
+                auth_hdr = _find_auth(scope)
+                if auth_hdr is None:
+                    _L.debug("No authorization header")
+                    return await self._prepare_error_response(
+                        'The request does not contain an "authorization" header',
+                        400,
+                        scope,
+                        receive,
+                        send,
+                    )
+                if auth_hdr[:_BEARER_LEN] != _BEARER:
+                    _L.debug('No "Bearer" in authorization header')
+                    return await self._prepare_error_response(
+                        'The "authorization" header must start with "Bearer "',
+                        400,
+                        scope,
+                        receive,
+                        send,
+                    )
+                token = auth_hdr[_BEARER_LEN:].decode("latin-1")
+
+            try:
+                provider, claims = self.cached_claims(token)
+                scope["oauth2-claims"] = claims
+                scope["oauth2-provider"] = provider
+                scope["oauth2-jwt"] = token
+            except starlette_oauth2_api.InvalidToken as e:
+                return await self._prepare_error_response(
+                    e.errors, 401, scope, receive, send
+                )
+
+            return await self._app(scope, receive, send)
+
+    return AuthenticateMiddleware
+
+
+class AuthenticateMiddleware:
+    """
+    ASGI middleware that constructs the real AuthenticateMiddleware on the
+    first request rather than when the app is assembled. The providers are
+    still validated here so that configuration errors fail at startup.
+    """
+
+    def __init__(self, app: starlette.types.ASGIApp, **options) -> None:
+        for name, provider in options["providers"].items():
+            _validate_provider(name, provider)
+        self._app = app
+        self._options = options
+        self._middleware = None
+
+    async def __call__(
+        self,
+        scope: starlette.types.Scope,
+        receive: starlette.types.Receive,
+        send: starlette.types.Send,
+    ) -> None:
+        if self._middleware is None:
+            self._middleware = _make_middleware_cls()(self._app, **self._options)
+        return await self._middleware(scope, receive, send)
@@ -0,0 +1,50 @@
+"""
+Logging configuration for the applications, applied by main.py with
+logging.config.dictConfig.
+"""
+
+import settings
+
+LOG_LEVEL: str = settings.LOG_LEVEL
+FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOGGING_CONFIG = {
+    "version": 1,  # mandatory field
+    # if you want to overwrite existing loggers' configs
+    # "disable_existing_loggers": False,
+    "formatters": {
+        "basic": {
+            "format": FORMAT,
+        }
+    },
+    "handlers": {
+        "console": {
+            "formatter": "basic",
+            "class": "logging.StreamHandler",
+            "stream": "ext://sys.stderr",
+            # No level here, the logger levels below decide what is emitted
+        }
+    },
+    "loggers": {
+        "auth_middleware": {
+            "handlers": ["console"],
+            "level": LOG_LEVEL,
+        },
+        "uvicorn": {
+            "handlers": ["console"],
+            "level": LOG_LEVEL,
+        },
+        "protected_app": {
+            "handlers": ["console"],
+            "level": LOG_LEVEL,
+        },
+        "test_auth": {
+            "handlers": ["console"],
+            "level": LOG_LEVEL,
+            # "propagate": False
+        },
+        "httpx": {
+            "handlers": ["console"],
+            "level": settings.LOG_LEVEL_HTTPX,
+        },
+    },
+}
@@ -6,85 +6,77 @@ starlette_oauth2_api since there's some overlap of functionality there.
 
 import logging
 import logging.config
-import fastapi.staticfiles
+import logging_config
 import fastapi.templating
 import fastapi.responses
-import starlette.config
 import starlette.requests
 import starlette.datastructures
 
 # Setup logging before importing other apps that may log on import
-LOG_LEVEL: str = "DEBUG"
-FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-logging_config = {
-    "version": 1,  # mandatory field
-    # if you want to overwrite existing loggers' configs
-    # "disable_existing_loggers": False,
-    "formatters": {
-        "basic": {
-            "format": FORMAT,
-        }
-    },
-    "handlers": {
-        "console": {
-            "formatter": "basic",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stderr",
-            "level": LOG_LEVEL,
-        }
-    },
-    "loggers": {
-        "uvicorn": {
-            "handlers": ["console"],
-            "level": LOG_LEVEL,
-        },
-        "protected_app": {
-            "handlers": ["console"],
-            "level": LOG_LEVEL,
-        },
-        "test_auth": {
-            "handlers": ["console"],
-            "level": LOG_LEVEL,
-            # "propagate": False
-        },
-        "httpx": {
-            "handlers": ["console"],
-            "level": LOG_LEVEL,
-        },
-    },
-}
-logging.config.dictConfig(logging_config)
+logging.config.dictConfig(logging_config.LOGGING_CONFIG)
 
 # ===================================
 # Setup the application
 
 # import the sub-application
 import protected_app
+import auth_middleware
+import settings
+import static_files
 
 _L = logging.getLogger("test_auth")
-app = fastapi.FastAPI(debug=True)
 
 # https://fastapi.tiangolo.com/advanced/templates/
-app.mount("/static", fastapi.staticfiles.StaticFiles(directory="static"), name="static")
 templates = fastapi.templating.Jinja2Templates(directory="templates")
+_index_tpl = templates.get_template("index.html")
 
-config = starlette.config.Config(".env")
 
-app.mount("/protected", protected_app.app)
+async def prefetch_keys():
+    """
+    Load the ORCID JWKS before serving requests. Mounted apps do not
+    receive startup events, so this is done here for protected_app.
+    """
+    if settings.ORCID_KEYS.startswith("https://"):
+        await auth_middleware.prefetch_keys(settings.ORCID_KEYS)
+
 
 # ===================================
 # Application endpoints
 
 
-@app.get("/", response_class=fastapi.responses.HTMLResponse)
 async def home(request: starlette.requests.Request):
     """
     Show user info or a link to login
     """
-    return templates.TemplateResponse(
-        "index.html",
-        {"request": request, "protected_path": protected_app.app.root_path},
+    return fastapi.responses.HTMLResponse(
+        _index_tpl.render(
+            {"request": request, "protected_path": settings.PROTECTED_PATH}
+        )
+    )
+
+
+def create_app() -> fastapi.FastAPI:
+    """
+    Build the application. Usable with ``uvicorn main:create_app --factory``.
+    """
+    app = fastapi.FastAPI(debug=True)
+    app.mount(
+        "/static", static_files.CachedStaticFiles(directory="static"), name="static"
     )
+    app.mount(settings.PROTECTED_PATH, protected_app.create_app())
+    app.add_event_handler("startup", prefetch_keys)
+    app.add_api_route("/", home, response_class=fastapi.responses.HTMLResponse)
+    return app
+
+
+def __getattr__(name):
+    # Build the module level app on first access, e.g. by ``uvicorn main:app``,
+    # so that ``uvicorn main:create_app --factory`` only builds it once.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
@@ -13,177 +13,98 @@ The application defaults to `/protected` for the root path, though this
 may be set in the .env file with a `PROTECTED_PATH` property.
 '''
 
-import os
 import logging
-import fastapi.staticfiles
 import fastapi.templating
 import fastapi.responses
-import starlette.config
 import starlette.requests
 import starlette.middleware.cors
-import starlette.middleware.sessions
-import starlette.types
-import starlette.datastructures
-import starlette_oauth2_api
-import authlib.integrations.starlette_client
+import auth_middleware
+import settings
+import sessions
+import static_files
 
 _L = logging.getLogger("protected_app")
 
-# ===================================
-class AuthenticateMiddleware(starlette_oauth2_api.AuthenticateMiddleware):
-    """
-    Override the __call__ method of the AuthenticateMiddleware to also check
-    cookies for auth information. This enables access by either a JWT or the
-    authentication information stored in a cookie.
-    """
-
-    async def __call__(
-        self,
-        scope: starlette.types.Scope,
-        receive: starlette.types.Receive,
-        send: starlette.types.Send,
-    ) -> None:
-        request = starlette.requests.HTTPConnection(scope)
-        if request.url.path in self._public_paths:
-            return await self._app(scope, receive, send)
-
-        token = None
-        user = request.session.get("user")
-
-        # Cookie set with auth info
-        if user is not None:
-            token = user.get("id_token", None)
-
-        # check for authorization header and token on it.
-        elif "authorization" in request.headers and request.headers[
-            "authorization"
-        ].startswith("Bearer "):
-            token = request.headers["authorization"][len("Bearer ") :]
-
-        elif "authorization" in request.headers:
-            _L.debug('No "Bearer" in authorization header')
-            return await self._prepare_error_response(
-                'The "authorization" header must start with "Bearer "',
-                400,
-                scope,
-                receive,
-                send,
-            )
-        else:
-            _L.debug("No authorization header")
-            return await self._prepare_error_response(
-                'The request does not contain an "authorization" header',
-                400,
-                scope,
-                receive,
-                send,
-            )
-
-        try:
-            provider, claims = self.claims(token)
-            scope["oauth2-claims"] = claims
-            scope["oauth2-provider"] = provider
-            scope["oauth2-jwt"] = token
-        except starlette_oauth2_api.InvalidToken as e:
-            return await self._prepare_error_response(
-                e.errors, 401, scope, receive, send
-            )
-
-        return await self._app(scope, receive, send)
-
-
-# Load configuration from the .env file
-_L.info("Config file .env exists: %s", os.path.exists(".env"))
-config = starlette.config.Config(".env")
-
-app = fastapi.FastAPI(
-    debug=True, root_path=config.get("PROTECTED_PATH", default="/protected")
-)
-
-app.mount("/static", fastapi.staticfiles.StaticFiles(directory="static"), name="static")
+# Configuration is loaded from the .env file by the settings module
+_L.info("Config file %s exists: %s", settings.ENV_FILE, settings.ENV_FILE_EXISTS)
+
 templates = fastapi.templating.Jinja2Templates(directory="templates")
+_user_tpl = templates.get_template("user.html")
+
+_oauth = None
+_orcid_client = None
+
+
+def _get_oauth():
+    """
+    Return the authlib OAuth registry, importing authlib and creating the
+    registry on first use.
+    """
+    global _oauth
+    if _oauth is None:
+        import authlib.integrations.starlette_client
+
+        _oauth = authlib.integrations.starlette_client.OAuth(settings.config)
+    return _oauth
+
+
+def _get_orcid():
+    """
+    Return the ORCID OAuth client, registering it on first use so that
+    nothing is done for it until the first /login or /auth request.
+    """
+    global _orcid_client
+    if _orcid_client is None:
+        oauth = _get_oauth()
+        # Registration here is using openid, which is a higher level wrapper
+        # around the oauth end points. Take a look at the info at the
+        # server_metadata_url
+        oauth.register(
+            name="orcid",
+            server_metadata_url="https://orcid.org/.well-known/openid-configuration",
+            client_kwargs={"scope": "openid"},
+            api_base_url="https://orcid.org/",
+            ##request_token_url='https://orcid.org/oauth/request_token',
+            # access_token_url='https://orcid.org/oauth/token',
+            # scope='/authenticate',
+            # access_token_params={'grant_type':'authorization_code'},
+            # authorize_url='https://orcid.org/oauth/authorize',
+            ##authorize_params=None,
+        )
+        _orcid_client = oauth.orcid
+    return _orcid_client
+
 
-oauth = authlib.integrations.starlette_client.OAuth(config)
-
-app.add_middleware(
-    AuthenticateMiddleware,
-    providers={
-        "orcid": {
-            "keys": config.get("ORCID_KEYS", default="https://orcid.org/oauth/jwks"),
-            "issuer": config.get("ORCID_ISSUER", default="https://orcid.org"),
-            "audience": config.get("ORCID_CLIENT_ID", default="APP-ZTT8BDD9D2LPQNFV"),
-        }
-    },
-    # These paths are not protected, everything else within this app requires authenticated user
-    public_paths={
-        f"{app.root_path}/login",
-        f"{app.root_path}/logout",
-        f"{app.root_path}/auth",
-    },
-)
-
-app.add_middleware(
-    starlette.middleware.sessions.SessionMiddleware,
-    secret_key=config.get("SECRET_KEY", default="secret-key-not-set"),
-)
-
-# https://www.starlette.io/middleware/#corsmiddleware
-app.add_middleware(
-    starlette.middleware.cors.CORSMiddleware,
-    allow_origins=config.get(
-        "CORS_ORIGINS",
-        cast=starlette.datastructures.CommaSeparatedStrings,
-        default=[
-            "*",
-        ],
-    ),
-    allow_methods=config.get(
-        "CORS_METHODS",
-        cast=starlette.datastructures.CommaSeparatedStrings,
-        default=["GET", "HEAD"],
-    ),
-    allow_headers=["authorization"],
-)
-
-
-# Registration here is using openid, which is a higher level wrapper
-# around the oauth end points. Take a look at the info at the
-# server_metadata_url
-oauth.register(
-    name="orcid",
-    server_metadata_url="https://orcid.org/.well-known/openid-configuration",
-    client_kwargs={"scope": "openid"},
-    api_base_url="https://orcid.org/",
-    ##request_token_url='https://orcid.org/oauth/request_token',
-    # access_token_url='https://orcid.org/oauth/token',
-    # scope='/authenticate',
-    # access_token_params={'grant_type':'authorization_code'},
-    # authorize_url='https://orcid.org/oauth/authorize',
-    ##authorize_params=None,
-)
-
-
-@app.get("/login")
 async def login(request: starlette.requests.Request):
     """
     Initiate OAuth2 login with ORCID
     """
     redirect_uri = request.url_for("auth")
-    return await oauth.orcid.authorize_redirect(request, redirect_uri)
+    return await _get_orcid().authorize_redirect(request, redirect_uri)
 
 
-@app.get("/auth")
 async def auth(request: starlette.requests.Request):
     """
     This method is called back by ORCID oauth. The URL for this method
     needs to be in the registered callbacks of the ORCID Oauth configuration.
     """
-    token = await oauth.orcid.authorize_access_token(request)
-    request.session["user"] = dict(token)
+    token = await _get_orcid().authorize_access_token(request)
+    # Only keep what the pages and middleware use, since the session cookie
+    # is signed and sent back on every request.
+    userinfo = token.get("userinfo", {})
+    request.session["user"] = {
+        "id_token": token["id_token"],
+        "orcid": token.get("orcid"),
+        "name": token.get("name"),
+        "expires_at": token.get("expires_at"),
+        "userinfo": {
+            "sub": userinfo.get("sub"),
+            "auth_time": userinfo.get("auth_time"),
+        },
+    }
     return starlette.responses.RedirectResponse(url=request.app.root_path)
 
 
-@app.get("/logout")
 async def logout(request: starlette.requests.Request):
     """
     Logout by removing the cookie from the user session.
@@ -201,7 +122,6 @@ async def logout(request: starlette.requests.Request):
     return starlette.responses.RedirectResponse(url="/")
 
 
-@app.get("/service")
 async def service(request: starlette.requests.Request):
     """
     This page is not reachable without credentials provided by the
@@ -212,11 +132,11 @@ async def service(request: starlette.requests.Request):
         "provider": request.scope["oauth2-provider"],
         "id_token": request.scope["oauth2-jwt"],
     }
-    return data
+    # Returning the response directly skips jsonable_encoder
+    return fastapi.responses.ORJSONResponse(data)
 
 
-@app.get("/restricted")
-async def service(request: starlette.requests.Request):
+async def restricted(request: starlette.requests.Request):
     """
     Only allow ORCID 0000-0002-6513-4996
     """
@@ -229,18 +149,82 @@ async def service(request: starlette.requests.Request):
     return claims
 
 
-@app.get("/", response_class=fastapi.responses.HTMLResponse)
 async def home(request: starlette.requests.Request):
     """
     Show user info or a link to login
     """
     user = request.session.get("user")
-    app_info = {
+    return fastapi.responses.HTMLResponse(
+        _user_tpl.render({"request": request, "user": user, "app_info": request.app.state.app_info})
+    )
+
+
+def create_app() -> fastapi.FastAPI:
+    """
+    Build the protected application, with its middleware and routes.
+    """
+    app = fastapi.FastAPI(debug=True, root_path=settings.PROTECTED_PATH)
+
+    app.mount(
+        "/static", static_files.CachedStaticFiles(directory="static"), name="static"
+    )
+
+    root = app.root_path
+    app.add_middleware(
+        auth_middleware.AuthenticateMiddleware,
+        providers={
+            "orcid": {
+                "keys": settings.ORCID_KEYS,
+                "issuer": settings.ORCID_ISSUER,
+                "audience": settings.ORCID_CLIENT_ID,
+            }
+        },
+        # These paths are not protected, everything else within this app requires authenticated user
+        public_paths=frozenset((f"{root}/login", f"{root}/logout", f"{root}/auth")),
+        # Static assets are served without authentication
+        public_prefixes=(f"{root}/static/",),
+    )
+
+    # SessionMiddleware must be added after (i.e. wrap) AuthenticateMiddleware
+    # since the latter reads the session cookie.
+    app.add_middleware(
+        sessions.ORJSONSessionMiddleware,
+        secret_key=settings.SECRET_KEY,
+    )
+
+    # https://www.starlette.io/middleware/#corsmiddleware
+    app.add_middleware(
+        starlette.middleware.cors.CORSMiddleware,
+        allow_origins=settings.CORS_ORIGINS,
+        allow_methods=settings.CORS_METHODS,
+        allow_headers=["authorization"],
+    )
+
+    app.add_api_route("/login", login)
+    app.add_api_route("/auth", auth)
+    app.add_api_route("/logout", logout)
+    app.add_api_route(
+        "/service", service, response_class=fastapi.responses.ORJSONResponse
+    )
+    app.add_api_route("/restricted", restricted)
+    app.add_api_route("/", home, response_class=fastapi.responses.HTMLResponse)
+
+    # Routes are fixed at this point, so the app info shown by home is
+    # computed once here.
+    app.state.app_info = {
         "root_path": app.root_path,
         "root_path_in_servers": app.root_path_in_servers,
         "servers": app.servers,
-        "routes": [route.path for route in app.routes],
+        "routes": tuple(route.path for route in app.routes),
     }
-    return templates.TemplateResponse(
-        "user.html", {"request": request, "user": user, "app_info": app_info}
-    )
+    return app
+
+
+def __getattr__(name):
+    # Build the module level app on first access, e.g. by
+    # ``uvicorn protected_app:app``, rather than on import.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
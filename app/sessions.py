@@ -0,0 +1,73 @@
+"""
+SessionMiddleware that serializes the session with orjson.
+"""
+
+import base64
+import orjson
+import itsdangerous.exc
+import starlette.datastructures
+import starlette.middleware.sessions
+import starlette.requests
+import starlette.types
+
+
+class ORJSONSessionMiddleware(starlette.middleware.sessions.SessionMiddleware):
+    """
+    Same as starlette's SessionMiddleware, but using orjson in place of
+    json to decode and encode the session cookie. The cookie format is
+    unchanged, so existing sessions remain valid.
+    """
+
+    async def __call__(
+        self,
+        scope: starlette.types.Scope,
+        receive: starlette.types.Receive,
+        send: starlette.types.Send,
+    ) -> None:
+        if scope["type"] not in ("http", "websocket"):  # pragma: no cover
+            await self.app(scope, receive, send)
+            return
+
+        connection = starlette.requests.HTTPConnection(scope)
+        initial_session_was_empty = True
+
+        if self.session_cookie in connection.cookies:
+            data = connection.cookies[self.session_cookie].encode("utf-8")
+            try:
+                data = self.signer.unsign(data, max_age=self.max_age)
+                scope["session"] = orjson.loads(base64.b64decode(data))
+                initial_session_was_empty = False
+            except itsdangerous.exc.BadSignature:
+                scope["session"] = {}
+        else:
+            scope["session"] = {}
+
+        async def send_wrapper(message: starlette.types.Message) -> None:
+            if message["type"] == "http.response.start":
+                if scope["session"]:
+                    # We have session data to persist.
+                    data = base64.b64encode(orjson.dumps(scope["session"]))
+                    data = self.signer.sign(data)
+                    headers = starlette.datastructures.MutableHeaders(scope=message)
+                    header_value = "{session_cookie}={data}; path={path}; {max_age}{security_flags}".format(  # noqa E501
+                        session_cookie=self.session_cookie,
+                        data=data.decode("utf-8"),
+                        path=self.path,
+                        max_age=f"Max-Age={self.max_age}; " if self.max_age else "",
+                        security_flags=self.security_flags,
+                    )
+                    headers.append("Set-Cookie", header_value)
+                elif not initial_session_was_empty:
+                    # The session has been cleared.
+                    headers = starlette.datastructures.MutableHeaders(scope=message)
+                    header_value = "{session_cookie}={data}; path={path}; {expires}{security_flags}".format(  # noqa E501
+                        session_cookie=self.session_cookie,
+                        data="null",
+                        path=self.path,
+                        expires="expires=Thu, 01 Jan 1970 00:00:00 GMT; ",
+                        security_flags=self.security_flags,
+                    )
+                    headers.append("Set-Cookie", header_value)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,38 @@
+"""
+Application settings, read once from the .env file or the environment.
+"""
+
+import os
+import starlette.config
+import starlette.datastructures
+
+ENV_FILE: str = ".env"
+ENV_FILE_EXISTS: bool = os.path.exists(ENV_FILE)
+
+config = starlette.config.Config(ENV_FILE)
+
+PROTECTED_PATH: str = config.get("PROTECTED_PATH", default="/protected")
+ORCID_KEYS: str = config.get("ORCID_KEYS", default="https://orcid.org/oauth/jwks")
+ORCID_ISSUER: str = config.get("ORCID_ISSUER", default="https://orcid.org")
+ORCID_CLIENT_ID: str = config.get("ORCID_CLIENT_ID", default="APP-ZTT8BDD9D2LPQNFV")
+SECRET_KEY: str = config.get("SECRET_KEY", default="secret-key-not-set")
+CORS_ORIGINS: tuple = tuple(
+    config.get(
+        "CORS_ORIGINS",
+        cast=starlette.datastructures.CommaSeparatedStrings,
+        default="*",
+    )
+)
+CORS_METHODS: tuple = tuple(
+    config.get(
+        "CORS_METHODS",
+        cast=starlette.datastructures.CommaSeparatedStrings,
+        default="GET,HEAD",
+    )
+)
+# Static URLs are not fingerprinted, so browsers revalidate with the ETag
+# and get a 304 when the file is unchanged.
+STATIC_CACHE_CONTROL: str = config.get("STATIC_CACHE_CONTROL", default="no-cache")
+# Set LOG_LEVEL=INFO in production
+LOG_LEVEL: str = config.get("LOG_LEVEL", default="DEBUG")
+LOG_LEVEL_HTTPX: str = config.get("LOG_LEVEL_HTTPX", default="WARNING")